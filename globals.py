@@ -1,8 +1,8 @@
-import multiprocessing as mp
+import threading
 
 global lock
 
 
-def init(rlock=None) -> None:
+def init(shared_lock=None) -> None:
     global lock
-    lock = mp.RLock() if not rlock else rlock
+    lock = threading.Lock() if not shared_lock else shared_lock
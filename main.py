@@ -1,77 +1,73 @@
-from multiprocessing.pool import ThreadPool
+import sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
 import globals
 from nuget.models.metadata import VersionRange
 from nuget.nugetclient import NugetClient
 from nuget.xml import get_package_references
 
+MAX_WORKERS = 32
 
-def main() -> None:
-    prefs = get_package_references('test.xml')
-
-    client = NugetClient()
-
-    with ThreadPool(processes=None, initializer=globals.init, initargs=(globals.lock,)) as pool:
-        args = ((pref.name, pref.version) for pref in prefs)
-        async_result = pool.starmap_async(client.get_metadata, args)
-        results = async_result.get()
+# catalog entries use both '.NETStandard2.0' and 'netstandard2.0' spellings
+_TFM_PREFIXES = ('.netstandard2', 'netstandard2', '.netcoreapp', 'netcoreapp', 'net5.0')
 
-    grouped_deps: dict[str, list[tuple[str, str]]] = {}
-    for result in results:
 
-        # print(result.entry.name, 'dependecies:', '\n')
-        metadata = result
-        if metadata:
-            deps = []
-            if metadata.entry.dependency_groups:
-                depgroup = [
-                    dg for dg in metadata.entry.dependency_groups if
-                    not dg.target_framework or 'netstandard2' in dg.target_framework
-                    or 'net5.0' in dg.target_framework or 'netcoreapp' in dg.target_framework][0]
+def main() -> None:
+    prefs = get_package_references('test.xml')
 
-                for dep in depgroup.dependencies:
-                    if dep.name not in grouped_deps:
-                        grouped_deps[dep.name] = []
-                    grouped_deps[dep.name].append(
-                        (f'{dep.name} {dep.range}', metadata.entry.name))
+    client = NugetClient(max_connections=MAX_WORKERS)
 
-                    deps.append(dep)
-                    # print(dep.name, dep.range, depgroup.target_framework)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        names = (pref.name for pref in prefs)
+        versions = (pref.version for pref in prefs)
+        results = list(pool.map(client.get_metadata, names, versions))
 
-        # print('____________________________________________________')
+    grouped_deps: defaultdict[str, list[tuple[str, str]]] = defaultdict(list)
+    for metadata in results:
+        if not metadata or not metadata.entry.dependency_groups:
+            continue
 
-    for key in grouped_deps.keys():
-        print(key, ':')
-        for item in grouped_deps[key]:
-            print(item)
-        print('___________________________________')
+        depgroup = next((
+            dg for dg in metadata.entry.dependency_groups if
+            not dg.target_framework or dg.target_framework.startswith(_TFM_PREFIXES)), None)
+        if depgroup is None:
+            continue
 
-    depnames = [k.lower() for k in grouped_deps.keys()]
-    metapackages = [pref for pref in prefs if pref.name.lower()
-                    not in depnames]
+        for dep in depgroup.dependencies:
+            grouped_deps[dep.name].append(
+                (f'{dep.name} {dep.range}', metadata.entry.name))
 
-    print()
-    print('META PACKAGES:')
-    for mp in sorted(metapackages, key=lambda pf: pf.name):
-        print(mp.name)
+    lines: list[str] = []
+    for key, items in grouped_deps.items():
+        lines.append(f'{key} :')
+        lines.extend(map(str, items))
+        lines.append('___________________________________')
 
-    print()
+    depnames = {k.lower() for k in grouped_deps}
+    lower_prefs = [(pref, pref.name.lower()) for pref in prefs]
+    metapackages = [pref for pref, name in lower_prefs if name not in depnames]
+    impostors = [pref for pref, name in lower_prefs if name in depnames]
 
-    impostors = [pref for pref in prefs if pref.name.lower() in depnames]
-    print('IMPOSTOR PACKAGES:')
-    for imp in sorted(impostors, key=lambda pf: pf.name):
-        print(imp.name)
+    lines.append('')
+    lines.append('META PACKAGES:')
+    lines.extend(mp.name for mp in sorted(metapackages, key=lambda pf: pf.name))
+    lines.append('')
 
-    print()
+    lines.append('IMPOSTOR PACKAGES:')
+    lines.extend(imp.name for imp in sorted(impostors, key=lambda pf: pf.name))
+    lines.append('')
 
-    print('TRANSITIVE PACKAGES')
-    for transitive in sorted(depnames):
-        print(transitive)
+    lines.append('TRANSITIVE PACKAGES')
+    lines.extend(sorted(depnames))
 
     vrange1 = VersionRange.from_rangestring('(5.0.13, 5.0.16]')
     vrange2 = VersionRange.from_rangestring('(5.0.11, 5.0.14]')
 
-    print(vrange1.common_minimum_version(vrange2))
+    lines.append(str(vrange1.common_minimum_version(vrange2)))
+
+    sys.stdout.write('\n'.join(lines))
+    sys.stdout.write('\n')
 
 
 if __name__ == '__main__':
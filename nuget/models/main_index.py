@@ -21,7 +21,7 @@ class Index:
         for resdict in index_json['resources']:
             id = resdict['@id']
             type = resdict['@type']
-            comment = resdict['comment'] if 'comment' in resdict else None
+            comment = resdict.get('comment')
             resource = Resource(id, type, comment)
             if resource.type not in resources:
                 resources[resource.type] = []
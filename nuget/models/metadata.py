@@ -1,106 +1,94 @@
-from dataclasses import dataclass
+import re
+import sys
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache, total_ordering
 from typing import Any
 
 
-@dataclass(init=False)
+_VERSION_RE = re.compile(r'\s*(\d+)\.(\d+)(?:\.(\d+))?(?:\.(\d+))?([-+]\S*)?\s*')
+# release part as stored on Version: optional 4th (revision) number, prerelease, build metadata
+_RELEASE_RE = re.compile(r'(?:\.(\d+))?(?:-([^+]*))?(?:\+.*)?')
+_RANGE_RE = re.compile(r'\s*(?:([\[(])\s*([^\s,\])]*)\s*(?:(,)\s*([^\s,\])]*)\s*)?([\])])|([^\s,\[\]()]+))\s*')
+
+
+# (major, minor, patch, revision, prerelease precedence)
+_VersionKey = tuple[int, int, int, int, tuple]
+
+
+def _prerelease_key(prerelease: str | None) -> tuple:
+    # a stable version sorts after all of its prereleases; prerelease
+    # identifiers compare numerically when numeric, numbers before labels
+    if prerelease is None:
+        return (1,)
+    return (0, tuple((0, int(part), '') if part.isdigit() else (1, 0, part.lower())
+                     for part in prerelease.split('.')))
+
+
+@lru_cache(maxsize=8192)
+def _parse_version(version_str: str) -> 'Version':
+    m = _VERSION_RE.fullmatch(version_str)
+    if not m:
+        raise ValueError(f'invalid version string: {version_str!r}')
+
+    major, minor, patch, revision, release = m.groups()
+    if revision:
+        release = f'.{revision}{release if release else ""}'
+    return Version(int(major), int(minor), int(patch) if patch else 0, release)
+
+
+@total_ordering
+@dataclass(frozen=True, slots=True)
 class Version:
     major: int
     minor: int
-    patch: int
-    release: str | None
-    text: str
+    patch: int = 0
+    release: str | None = None
+    text: str = field(init=False)
+    _key: _VersionKey = field(init=False, repr=False)
 
-    @property
-    def text(self) -> str:
-        return f'{self.major}.{self.minor}.{self.patch}{self.release if self.release else ""}'
+    def __post_init__(self) -> None:
+        release = self.release if self.release else ''
+        object.__setattr__(self, 'text', f'{self.major}.{self.minor}.{self.patch}{release}')
+
+        # build metadata after '+' never affects precedence
+        m = _RELEASE_RE.fullmatch(release)
+        revision, prerelease = m.groups() if m else (None, release)
+        object.__setattr__(self, '_key', (self.major, self.minor, self.patch,
+                                          int(revision) if revision else 0, _prerelease_key(prerelease)))
 
     @staticmethod
     def create(version_str: str) -> 'Version':
-        release = None
-        patch = None
-
-        release_delimiter = '-'
-        parts = version_str.strip().split(release_delimiter, maxsplit=1)
-        if len(parts) == 1:
-            parts = parts[0]
-            release_delimiter = '+'
-            parts = parts.split(release_delimiter, maxsplit=1)
-
-        if len(parts) > 1:
-            parts, release = parts
-            release = f'{release_delimiter}{release}'
-        else:
-            parts = parts[0]
-
-        parts = parts.split('.')
-
-        if len(parts) == 2:
-            major, minor = parts
-        elif len(parts) == 3:
-            major, minor, patch = parts
-        elif len(parts) > 3:
-            major, minor, patch, release = parts
-            release = f'.{release}'
-        v = Version()
-        v.major = int(major)
-        v.minor = int(minor)
-        v.patch = int(patch) if patch else 0
-        v.release = release
-        return v
+        return _parse_version(version_str)
 
     def copy(self) -> 'Version':
-        return Version.create(self.text)
+        return self
 
     def __eq__(self, value: object) -> bool:
-        if not isinstance(value, Version):
-            return False
-        return self.text == value.text
+        return isinstance(value, Version) and self._key == value._key
 
-    def __gt__(self, value: object) -> bool:
-        if not isinstance(value, Version):
-            raise ValueError(
-                'cannot compare Version object with non-Version object')
-        if self == value:
-            return False
-
-        if self.major > value.major:
-            return True
-
-        if self.major == value.major:
-            if self.minor > value.minor:
-                return True
-            if self.minor == value.minor and self.patch > value.patch:
-                return True
-        return False
+    def __hash__(self) -> int:
+        return hash(self._key)
 
     def __lt__(self, value: object) -> bool:
         if not isinstance(value, Version):
             raise ValueError(
                 'cannot compare Version object with non-Version object')
-        if self == value:
-            return False
-
-        return not self > value
-
-    def __ge__(self, value: object) -> bool:
-        if not isinstance(value, Version):
-            raise ValueError(
-                'cannot compare Version object with non-Version object')
-        return self == value or self > value
-
-    def __le__(self, value: object) -> bool:
-        if not isinstance(value, Version):
-            raise ValueError(
-                'cannot compare Version object with non-Version object')
-        return self == value or self < value
+        return self._key < value._key
 
 
-@dataclass(repr=False)
+@dataclass(repr=False, frozen=True, slots=True)
 class VersionRange:
     minimum: Version | None
     maximum: Version | None
     min_inclusive: bool = True
     max_inclusive: bool = True
+    _lower_key: _VersionKey | None = field(init=False, compare=False)
+    _upper_key: _VersionKey | None = field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, '_lower_key', self.minimum._key if self.minimum else None)
+        object.__setattr__(self, '_upper_key', self.maximum._key if self.maximum else None)
 
     def __repr__(self) -> str:
         left_bracket = '[' if self.min_inclusive else '('
@@ -110,84 +98,56 @@ class VersionRange:
         return f'{left_bracket}{minimum}, {maximum}{right_bracket}'
 
     @staticmethod
+    @lru_cache(maxsize=8192)
     def from_rangestring(rangestr: str) -> 'VersionRange':
-        min_inclusive = not rangestr.startswith('(')
-        max_inclusive = not rangestr.endswith(')')
-        minimum = None
-        maximum = None
-
-        parts = [p.strip() for p in rangestr.split(',')]
-        if len(parts) == 1:
-            versionstr = parts[0]
-            if '[' in versionstr and ']' in versionstr:
-                version = Version.create(versionstr[1:-1])
-                minimum = version
-                maximum = version
-            else:
-                version = Version.create(versionstr)
-                minimum = version
-        elif len(parts) == 2:
-            left, right = parts
-            if not (left == '(' and right == ')'):
-                if left == '(' or left == '[':
-                    version = Version.create(right[:-1])
-                    maximum = version
-                elif right == ')':
-                    version = Version.create(left[1:])
-                    minimum = version
-                else:
-                    minimum = Version.create(left[1:])
-                    maximum = Version.create(right[:-1])
-
-        return VersionRange(minimum, maximum, min_inclusive, max_inclusive)
-
-    def inrange(self, version: Version) -> bool:
-        if self.minimum:
-            if self.minimum == version:
-                return self.min_inclusive
+        m = _RANGE_RE.fullmatch(rangestr)
+        if not m:
+            raise ValueError(f'invalid version range string: {rangestr!r}')
 
-            if self.minimum > version:
-                return False
+        left_bracket, left, comma, right, right_bracket, bare = m.groups()
+        if bare:
+            return VersionRange(Version.create(bare), None)
 
-        if self.maximum:
-            if self.maximum == version:
-                return self.max_inclusive
+        minimum = Version.create(left) if left else None
+        maximum = Version.create(right) if right else None
+        if not comma:
+            maximum = minimum
+        return VersionRange(minimum, maximum, left_bracket == '[', right_bracket == ']')
 
-            if self.maximum < version:
-                return False
+    def inrange(self, version: Version) -> bool:
+        key = version._key
+        lower, upper = self._lower_key, self._upper_key
+        if lower is not None and (key < lower or (key == lower and not self.min_inclusive)):
+            return False
+        if upper is not None and (key > upper or (key == upper and not self.max_inclusive)):
+            return False
         return True
 
     def common_minimum_version(self, other: 'VersionRange') -> Version | None:
-        minimum = None
-        if self.minimum and other.minimum:
-            if self.minimum > other.minimum and self.min_inclusive:
-                minimum = self.minimum.copy()
-            elif self.minimum < other.minimum and other.min_inclusive:
-                minimum = other.minimum.copy()
-
-        if self.minimum and not other.minimum and self.min_inclusive:
-            minimum = self.minimum.copy()
-
-        if other.minimum and not self.minimum and other.min_inclusive:
-            minimum = other.minimum.copy()
-
-        if self.maximum and other.maximum:
-            if minimum:
-                if self.maximum <= minimum and self.max_inclusive:
-                    minimum = self.maximum.copy()
-                if other.maximum <= minimum and other.max_inclusive:
-                    minimum = other.maximum.copy()
-            else:
-                if self.maximum and other.maximum:
-                    if self.maximum < other.maximum and self.max_inclusive:
-                        minimum = self.maximum.copy()
-                    elif self.maximum > other.maximum and other.max_inclusive:
-                        minimum = other.maximum.copy()
-
-        return minimum
-
-
-@dataclass(init=False)
+        # tightest lower bound: higher version wins, exclusive wins a tie
+        lower, lower_inclusive = self.minimum, self.min_inclusive
+        if other.minimum and (not lower or other.minimum > lower
+                              or (other.minimum == lower and not other.min_inclusive)):
+            lower, lower_inclusive = other.minimum, other.min_inclusive
+
+        # tightest upper bound: lower version wins, exclusive wins a tie
+        upper, upper_inclusive = self.maximum, self.max_inclusive
+        if other.maximum and (not upper or other.maximum < upper
+                              or (other.maximum == upper and not other.max_inclusive)):
+            upper, upper_inclusive = other.maximum, other.max_inclusive
+
+        if lower and lower_inclusive:
+            if not upper or lower < upper or (lower == upper and upper_inclusive):
+                return lower.copy()
+
+        # an exclusive lower bound names no version, fall back to the upper one
+        if upper and upper_inclusive and (not lower or lower < upper):
+            return upper.copy()
+
+        return None
+
+
+@dataclass(init=False, slots=True)
 class EntryMetadata:
     url: str
     commit_id: str | None
@@ -203,13 +163,16 @@ class EntryMetadata:
         em.commit_id = entry_json.get('commitId')
         em.count = entry_json.get('count')
         em.type = entry_json.get('type')
+        if isinstance(em.type, str):
+            em.type = sys.intern(em.type)
         return em
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class IndexItem:
     metadata: EntryMetadata
     version_range: VersionRange
+    inlined_page: dict[str, Any] | None = field(repr=False)
 
     @staticmethod
     def create(item_json: dict[str, Any]) -> 'IndexItem':
@@ -218,27 +181,37 @@ class IndexItem:
         lower = Version.create(item_json['lower'])
         upper = Version.create(item_json['upper'])
         item.version_range = VersionRange(lower, upper)
+        item.inlined_page = item_json if 'items' in item_json else None
         return item
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class Index:
     metadata: EntryMetadata
     items: list[IndexItem]
+    _lower_keys: list[_VersionKey] = field(repr=False)
 
     @staticmethod
     def create(metadata_index_json: dict[str, Any]) -> 'Index':
-        items: list[IndexItem] = []
-        for item_json in metadata_index_json['items']:
-            items.append(IndexItem.create(item_json))
+        items = [IndexItem.create(item_json) for item_json in metadata_index_json['items']]
+        items.sort(key=lambda it: it.version_range.minimum._key)
 
         index = Index()
         index.metadata = EntryMetadata.create(metadata_index_json)
         index.items = items
+        index._lower_keys = [it.version_range.minimum._key for it in items]
         return index
 
+    def find(self, version: Version) -> IndexItem | None:
+        # index pages cover disjoint version ranges, only the last page
+        # starting at or below the version can contain it
+        pos = bisect_right(self._lower_keys, version._key) - 1
+        if pos >= 0 and self.items[pos].version_range.inrange(version):
+            return self.items[pos]
+        return None
 
-@dataclass(init=False)
+
+@dataclass(init=False, slots=True)
 class Dependency:
     url: str
     type: str
@@ -249,16 +222,14 @@ class Dependency:
     def create(depjson: dict[str, Any]) -> 'Dependency':
         d = Dependency()
         d.url = depjson['@id']
-        d.type = depjson['@type']
-        d.name = depjson['id']
+        d.type = sys.intern(depjson['@type'])
+        d.name = sys.intern(depjson['id'])
 
-        rangestr = depjson.get('range')
-        rangestr = rangestr if rangestr else '(, )'
-        d.range = VersionRange.from_rangestring(rangestr)
+        d.range = VersionRange.from_rangestring(depjson.get('range') or '(, )')
         return d
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class DependencyGroup:
     target_framework: str | None
     dependencies: list[Dependency]
@@ -266,22 +237,16 @@ class DependencyGroup:
     @staticmethod
     def create(depgroupjson: dict[str, Any]) -> 'DependencyGroup':
         dg = DependencyGroup()
-        dg.target_framework = depgroupjson.get('targetFramework')
-        dg.target_framework = dg.target_framework.lower() if dg.target_framework else None
-        deps: list[Dependency] = []
-        if 'dependencies' in depgroupjson:
-            for dep in depgroupjson['dependencies']:
-                d = Dependency.create(dep)
-                deps.append(d)
-        dg.dependencies = deps
+        tfm = depgroupjson.get('targetFramework')
+        dg.target_framework = sys.intern(tfm.lower()) if tfm else None
+        dg.dependencies = [Dependency.create(dep) for dep in depgroupjson.get('dependencies', ())]
         return dg
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class Vulnerability:
     advisory_url: str
     severity: int
-    severity_name: str
 
     @property
     def severity_name(self) -> str:
@@ -295,7 +260,7 @@ class Vulnerability:
         return v
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class CatalogEntry:
     url: str
     dependency_groups: list[DependencyGroup]
@@ -310,24 +275,15 @@ class CatalogEntry:
         ce.name = entryjson['id']
         ce.version = Version.create(entryjson['version'])
 
-        dgroups: list[DependencyGroup] = []
-        if dgjsons := entryjson.get('dependencyGroups'):
-            for dgjson in dgjsons:
-                dg = DependencyGroup.create(dgjson)
-                dgroups.append(dg)
-        ce.dependency_groups = dgroups
-
-        vulnerabs: list[Vulnerability] = []
-        if vjsons := entryjson.get('vulnerabilities'):
-            for vjson in vjsons:
-                v = Vulnerability.create(vjson)
-                vulnerabs.append(v)
-        ce.vulnerabilities = vulnerabs
+        ce.dependency_groups = [DependencyGroup.create(dgjson)
+                                for dgjson in entryjson.get('dependencyGroups') or ()]
+        ce.vulnerabilities = [Vulnerability.create(vjson)
+                              for vjson in entryjson.get('vulnerabilities') or ()]
 
         return ce
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class CatalogItem:
     metadata: EntryMetadata
     entry: CatalogEntry
@@ -340,7 +296,7 @@ class CatalogItem:
         return ci
 
 
-@dataclass(init=False)
+@dataclass(init=False, slots=True)
 class CatalogPage:
     metadata: EntryMetadata
     items: list[CatalogItem]
@@ -355,9 +311,5 @@ class CatalogPage:
         upper = Version.create(catalogpage_json['upper'])
         cp.version_range = VersionRange(lower, upper)
 
-        items: list[CatalogItem] = []
-        for itemjson in catalogpage_json['items']:
-            ci = CatalogItem.create(itemjson)
-            items.append(ci)
-        cp.items = items
+        cp.items = [CatalogItem.create(itemjson) for itemjson in catalogpage_json['items']]
         return cp
@@ -1,5 +1,4 @@
-import xml.etree.ElementTree as ET
-from dataclasses import dataclass, field
+from lxml import etree as ET
 
 
 class Consts:
@@ -15,85 +14,85 @@ class Consts:
         PROJECT = 'Project'
 
 
-@dataclass(init=False)
+_PACKAGE_REFERENCE_XPATH = ET.XPath(f'.//{Consts.Elements.ITEM_GROUP}/{Consts.Elements.PACKAGE_REFERENCE}')
+
+
 class PackageReference:
-    xml: ET.Element = field(repr=False)
-    root: ET.Element = field(repr=False)
-    name: str
-    vendor: str
-    version: str | None
-    version_override: str | None
+    __slots__ = ('xml', 'root', '_name', '_vendor', '_version', '_version_override')
+
+    xml: ET._Element
+    root: ET._Element
+
+    def __init__(self, element: ET._Element, item_group: ET._Element) -> None:
+        self.xml = element
+        self.root = item_group
+        self._name = element.get(Consts.Attributes.INCLUDE)
+        # Update="..." references have no Include
+        self._vendor = None
+        if self._name:
+            # only the first letter is raised; str.capitalize would turn 'NLog' into 'Nlog'
+            vendor = self._name.split('.', 1)[0]
+            self._vendor = f'{vendor[:1].upper()}{vendor[1:]}'
+        self._version = element.get(Consts.Attributes.VERSION)
+        self._version_override = element.get(Consts.Attributes.VERSION_OVERRIDE)
+
+    def __repr__(self) -> str:
+        return (f'PackageReference(name={self.name!r}, vendor={self.vendor!r}, '
+                f'version={self.version!r}, version_override={self.version_override!r})')
 
     @property
     def name(self) -> str:
-        return self.xml.get(Consts.Attributes.INCLUDE)
+        return self._name
 
     @property
     def version(self) -> str:
-        return self.xml.get(Consts.Attributes.VERSION)
+        return self._version
 
     @version.setter
     def version(self, value: str | None) -> None:
-        VERSION = Consts.Attributes.VERSION
+        attrib = self.xml.attrib
 
-        if value and not self.version_override:
-            self.xml.set(VERSION, value)
+        if value and not self._version_override:
+            attrib[Consts.Attributes.VERSION] = value
+            self._version = value
             return
 
-        if not value and VERSION in self.xml.attrib:
-            del self.xml.attrib[VERSION]
+        if not value:
+            attrib.pop(Consts.Attributes.VERSION, None)
+            self._version = None
 
     @property
     def version_override(self) -> str | None:
-        return self.xml.get(Consts.Attributes.VERSION_OVERRIDE)
+        return self._version_override
 
     @version_override.setter
     def version_override(self, value: str | None) -> None:
-        VERSION = Consts.Attributes.VERSION
-        VERSION_OVERRIDE = Consts.Attributes.VERSION_OVERRIDE
-
-        if isinstance(value, property):
-            return
+        attrib = self.xml.attrib
 
-        if VERSION_OVERRIDE in self.xml.attrib and not value:
-            del self.xml.attrib[VERSION_OVERRIDE]
+        if not value:
+            attrib.pop(Consts.Attributes.VERSION_OVERRIDE, None)
+            self._version_override = None
             return
 
-        if value:
-            self.xml.set(VERSION_OVERRIDE, value)
-            if VERSION in self.xml.attrib:
-                del self.xml.attrib[VERSION]
+        attrib[Consts.Attributes.VERSION_OVERRIDE] = value
+        self._version_override = value
+        attrib.pop(Consts.Attributes.VERSION, None)
+        self._version = None
 
     @property
-    def vendor(self) -> str:
-        vendor = self.name.split('.')[0]
-        vendor = f'{vendor[0].upper()}{vendor[1:]}'
-        return vendor
+    def vendor(self) -> str | None:
+        return self._vendor
 
     @staticmethod
-    def create(element: ET.Element, item_group: ET.Element) -> 'PackageReference':
-        pref = PackageReference()
-        pref.root = item_group
-        pref.xml = element
-        pref.version = element.get(Consts.Attributes.VERSION)
-        return pref
+    def create(element: ET._Element, item_group: ET._Element) -> 'PackageReference':
+        return PackageReference(element, item_group)
 
-    def __del__(self):
-        self.root.remove(self.xml)
+    def detach(self) -> None:
+        parent = self.xml.getparent()
+        if parent is not None:
+            parent.remove(self.xml)
 
 
 def get_package_references(csproj_filepath: str) -> list[PackageReference]:
-    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
-    tree = ET.parse(csproj_filepath, parser=parser)
-    root = tree.getroot()
-
-    XPATH = f'./{Consts.Elements.ITEM_GROUP}[{Consts.Elements.PACKAGE_REFERENCE}]'
-
-    prefs: list[PackageReference] = []
-    itemgroups = root.findall(XPATH)
-    for ig in itemgroups:
-        for elem in ig.iter():
-            if elem.tag == Consts.Elements.PACKAGE_REFERENCE:
-                pref = PackageReference.create(elem, ig)
-                prefs.append(pref)
-    return prefs
+    root = ET.parse(csproj_filepath).getroot()
+    return [PackageReference.create(elem, elem.getparent()) for elem in _PACKAGE_REFERENCE_XPATH(root)]
@@ -1,5 +1,7 @@
 import unittest
 
+from tests.metadatatests import *
+from tests.nugetclienttests import *
 from tests.xmltests import *
 
 if __name__ == '__main__':
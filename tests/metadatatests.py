@@ -0,0 +1,114 @@
+import unittest
+
+from nuget.models.metadata import Index, Version, VersionRange
+
+
+class TestVersion(unittest.TestCase):
+    def test_create(self):
+        self.assertEqual(Version.create('1.2').text, '1.2.0')
+        self.assertEqual(Version.create(' 1.2.3 ').text, '1.2.3')
+        self.assertEqual(Version.create('1.2.3-beta.1').release, '-beta.1')
+        self.assertEqual(Version.create('1.2.3+sha.5114f85').release, '+sha.5114f85')
+        self.assertEqual(Version.create('1.2.3.4').release, '.4')
+        self.assertEqual(Version.create('1.2.3.4-rc1').text, '1.2.3.4-rc1')
+
+    def test_create_invalid(self):
+        with self.assertRaises(ValueError):
+            Version.create('1')
+        with self.assertRaises(ValueError):
+            Version.create('1.x.0')
+
+    def test_ordering(self):
+        self.assertLess(Version.create('1.2.3'), Version.create('1.10.0'))
+        self.assertGreater(Version.create('2.0'), Version.create('1.9.9'))
+        self.assertEqual(Version.create('1.0'), Version.create('1.0.0'))
+        self.assertGreaterEqual(Version.create('1.0'), Version.create('1.0.0'))
+        self.assertNotEqual(Version.create('1.0.0'), Version.create('1.0.0-beta'))
+
+    def test_ordering_release(self):
+        self.assertLess(Version.create('1.0.0-beta'), Version.create('1.0.0'))
+        self.assertLess(Version.create('1.0.0'), Version.create('1.0.0.1'))
+        self.assertLess(Version.create('1.0.0.9'), Version.create('1.0.0.10'))
+        self.assertLess(Version.create('1.0.0.1-rc'), Version.create('1.0.0.1'))
+        self.assertLess(Version.create('1.0.0-rc.9'), Version.create('1.0.0-rc.10'))
+        self.assertLess(Version.create('1.0.0-alpha'), Version.create('1.0.0-alpha.1'))
+        self.assertLess(Version.create('1.0.0-alpha.1'), Version.create('1.0.0-alpha.beta'))
+        self.assertLess(Version.create('1.0.0-1'), Version.create('1.0.0-alpha'))
+        self.assertLess(Version.create('1.0.0-beta'), Version.create('1.0.0-rc'))
+
+    def test_key_matches_normalized_versions(self):
+        # find_catalogitem matches catalog entries on _key
+        self.assertEqual(Version.create('1.0')._key, Version.create('1.0.0')._key)
+        self.assertEqual(Version.create('1.0.0.0')._key, Version.create('1.0.0')._key)
+        self.assertEqual(Version.create('1.0.0-RC.1')._key, Version.create('1.0.0-rc.1')._key)
+        self.assertNotEqual(Version.create('1.0.0.1')._key, Version.create('1.0.0')._key)
+
+    def test_equality_ignores_build_metadata(self):
+        self.assertEqual(Version.create('1.0.0+sha.5114f85'), Version.create('1.0.0'))
+        self.assertEqual(Version.create('1.0.0-rc.1+build'), Version.create('1.0.0-rc.1'))
+        self.assertLess(Version.create('1.0.0-rc+zzz'), Version.create('1.0.0'))
+
+
+class TestVersionRange(unittest.TestCase):
+    def test_from_rangestring(self):
+        vrange = VersionRange.from_rangestring('(5.0.13, 5.0.16]')
+        self.assertEqual(repr(vrange), '(5.0.13, 5.0.16]')
+        self.assertEqual(repr(VersionRange.from_rangestring('[1.0]')), '[1.0.0, 1.0.0]')
+        self.assertEqual(repr(VersionRange.from_rangestring('1.0')), '[1.0.0, ]')
+        self.assertEqual(repr(VersionRange.from_rangestring('(, )')), '(, )')
+        self.assertEqual(repr(VersionRange.from_rangestring('[1.0,2.0)')), '[1.0.0, 2.0.0)')
+
+    def test_from_rangestring_invalid(self):
+        for rangestr in ('[1.0', '1.0, 2.0', '[1.0 2.0]', '(1.0, 2.0, 3.0)'):
+            with self.assertRaises(ValueError):
+                VersionRange.from_rangestring(rangestr)
+
+    def test_inrange(self):
+        vrange = VersionRange.from_rangestring('(5.0.13, 5.0.16]')
+        self.assertFalse(vrange.inrange(Version.create('5.0.13')))
+        self.assertTrue(vrange.inrange(Version.create('5.0.14')))
+        self.assertTrue(vrange.inrange(Version.create('5.0.16')))
+        self.assertFalse(vrange.inrange(Version.create('5.0.17')))
+
+    def test_common_minimum_version(self):
+        vrange1 = VersionRange.from_rangestring('(5.0.13, 5.0.16]')
+        vrange2 = VersionRange.from_rangestring('(5.0.11, 5.0.14]')
+        self.assertEqual(vrange1.common_minimum_version(vrange2), Version.create('5.0.14'))
+
+        vrange1 = VersionRange.from_rangestring('[1.0, )')
+        vrange2 = VersionRange.from_rangestring('[2.0, )')
+        self.assertEqual(vrange1.common_minimum_version(vrange2), Version.create('2.0'))
+
+        vrange1 = VersionRange.from_rangestring('[1.0, 2.0]')
+        vrange2 = VersionRange.from_rangestring('[3.0, 4.0]')
+        self.assertIsNone(vrange1.common_minimum_version(vrange2))
+
+
+def _index(*pages: tuple[str, str]) -> Index:
+    return Index.create({
+        '@id': 'index.json',
+        'items': [{'@id': f'page{i}.json', 'lower': lower, 'upper': upper}
+                  for i, (lower, upper) in enumerate(pages)],
+    })
+
+
+class TestIndex(unittest.TestCase):
+    def test_find(self):
+        index = _index(('2.0.0', '3.0.0'), ('1.0.0', '1.1.0'))
+        self.assertEqual(index.find(Version.create('1.0.5')).metadata.url, 'page1.json')
+        self.assertEqual(index.find(Version.create('3.0.0')).metadata.url, 'page0.json')
+        self.assertIsNone(index.find(Version.create('0.9.0')))
+        self.assertIsNone(index.find(Version.create('1.5.0')))
+        self.assertIsNone(index.find(Version.create('3.0.1')))
+
+    def test_find_prerelease_lower_bound(self):
+        index = _index(('1.0.0', '1.1.0'), ('2.0.0-beta', '3.0.0'))
+        self.assertEqual(index.find(Version.create('2.0.0')).metadata.url, 'page1.json')
+        self.assertEqual(index.find(Version.create('2.0.0-beta')).metadata.url, 'page1.json')
+        self.assertIsNone(index.find(Version.create('2.0.0-alpha')))
+
+    def test_find_prerelease_upper_bound(self):
+        index = _index(('1.0.0', '2.0.0-beta'), ('2.0.0', '3.0.0'))
+        self.assertEqual(index.find(Version.create('2.0.0-beta')).metadata.url, 'page0.json')
+        self.assertEqual(index.find(Version.create('2.0.0')).metadata.url, 'page1.json')
+        self.assertIsNone(index.find(Version.create('2.0.0-rc')))
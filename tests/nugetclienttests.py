@@ -0,0 +1,207 @@
+import gzip
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+import orjson
+import requests
+
+import globals
+from nuget.models.metadata import Index
+from nuget.nugetclient import Cache, CacheEntry, NugetClient
+
+
+def _response(url: str, content: bytes = b'{}') -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.reason = 'OK'
+    response.url = url
+    response.headers['Content-Type'] = 'application/json'
+    response.encoding = 'utf-8'
+    response._content = content
+    return response
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        globals.init()
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = Cache.init(self.dirpath)
+
+    def tearDown(self):
+        self.flush()
+        shutil.rmtree(self.dirpath)
+
+    def flush(self):
+        flusher = threading.Thread(target=self.cache.flush, daemon=True)
+        flusher.start()
+        flusher.join(timeout=5)
+        self.assertFalse(flusher.is_alive(), 'cache writer stopped processing entries')
+
+    def cachefiles(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.dirpath) if name.endswith('.cache'))
+
+
+class TestCache(CacheTestCase):
+    def test_roundtrip(self):
+        url = 'https://example.org/index.json'
+        self.cache.add(url, _response(url, b'{"items": []}'))
+        self.flush()
+        self.assertEqual(len(self.cachefiles()), 1)
+        self.assertEqual([name for name in os.listdir(self.dirpath) if name.endswith('.tmp')], [])
+
+        cache = Cache.init(self.dirpath)
+        self.assertIn(url, cache)
+        response = cache.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.reason, 'OK')
+        self.assertEqual(response.url, url)
+        self.assertEqual(response.headers['content-type'], 'application/json')
+        self.assertEqual(response.encoding, 'utf-8')
+        self.assertEqual(response.content, b'{"items": []}')
+
+    def test_entries_outside_memory_are_reloaded(self):
+        with mock.patch.object(Cache, 'MEMORY_ENTRIES', 1):
+            self.cache.add('https://example.org/a', _response('https://example.org/a', b'a'))
+            self.cache.add('https://example.org/b', _response('https://example.org/b', b'b'))
+            self.flush()
+            self.assertEqual(self.cache.get('https://example.org/a').content, b'a')
+            self.assertEqual(self.cache.get('https://example.org/b').content, b'b')
+
+    def test_replace_while_write_in_flight(self):
+        url = 'https://example.org/replaced'
+        writing, replaced = threading.Event(), threading.Event()
+        save = CacheEntry.save
+
+        def slow_save(entry):
+            if entry.value.content == b'old':
+                writing.set()
+                replaced.wait(timeout=5)
+            save(entry)
+
+        with mock.patch.object(CacheEntry, 'save', slow_save):
+            self.cache.add(url, _response(url, b'old'))
+            self.assertTrue(writing.wait(timeout=5))
+            self.cache.add(url, _response(url, b'new'))
+            replaced.set()
+            self.flush()
+
+        self.assertEqual(len(self.cachefiles()), 1)
+        self.assertEqual(Cache.init(self.dirpath).get(url).content, b'new')
+
+    def test_max_entries_evicts_least_recently_used(self):
+        urls = [f'https://example.org/{i}' for i in range(5)]
+        with mock.patch.object(Cache, 'MAX_ENTRIES', 3):
+            for url in urls[:3]:
+                self.cache.add(url, _response(url))
+            self.cache.get(urls[0])
+            for url in urls[3:]:
+                self.cache.add(url, _response(url))
+            self.flush()
+
+        self.assertEqual([url in self.cache for url in urls], [True, False, False, True, True])
+        self.assertEqual(self.cachefiles(), sorted(self.cache.index[Cache.hashkey(url)].filename
+                                                   for url in (urls[0], urls[3], urls[4])))
+
+    def test_expired_entries(self):
+        url = 'https://example.org/expired'
+        self.cache.add(url, _response(url), timedelta(seconds=-1))
+        self.cache.add('https://example.org/fresh', _response('https://example.org/fresh'))
+        self.flush()
+        self.cache.delete_expired()
+        self.assertNotIn(url, self.cache)
+        self.assertEqual(len(self.cachefiles()), 1)
+
+        self.cache.add(url, _response(url), timedelta(seconds=-1))
+        self.flush()
+        self.assertIsNone(self.cache.get(url))
+        self.assertEqual(len(self.cachefiles()), 1)
+
+
+class TestCacheWriter(CacheTestCase):
+    def test_writer_survives_failed_write(self):
+        bad = _response('https://example.org/bad')
+        bad.headers['X-Bytes'] = b'not json'
+        self.cache.add(bad.url, bad)
+        self.cache.add('https://example.org/good', _response('https://example.org/good'))
+        self.flush()
+        self.assertEqual(len(self.cachefiles()), 1)
+
+
+class TestCacheFormat(CacheTestCase):
+    def test_unknown_format_is_refetched(self):
+        url = 'https://example.org/old'
+        entry = CacheEntry(Cache.hashkey(url), None, self.dirpath)
+        with open(entry.filepath, mode='wb') as file:
+            file.write(gzip.compress(b'NGC\x01' + pickle.dumps({'old': 'format'})))
+
+        cache = Cache.init(self.dirpath)
+        self.assertIn(url, cache)
+        self.assertIsNone(cache.get(url))
+        self.assertNotIn(url, cache)
+        self.assertEqual(self.cachefiles(), [])
+
+    def test_only_responses_are_saved(self):
+        self.cache.add('https://example.org/dict', {'not': 'a response'})
+        self.flush()
+        self.assertEqual(self.cachefiles(), [])
+
+
+class FakeHttpClient:
+    def __init__(self, pages: dict[str, dict]) -> None:
+        self.pages = pages
+        self.requested: list[str] = []
+
+    def get(self, url: str, expires_in: timedelta = None) -> requests.Response:
+        self.requested.append(url)
+        return _response(url, orjson.dumps(self.pages[url]))
+
+
+def _catalogpage(url: str, lower: str, upper: str, versions: list[str], inlined: bool = True) -> dict:
+    page = {'@id': url, '@type': 'catalog:CatalogPage', 'lower': lower, 'upper': upper}
+    if inlined:
+        page['items'] = [{'@id': f'{url}#{v}', 'catalogEntry': {'@id': f'{v}.json', 'id': 'Pkg', 'version': v}}
+                         for v in versions]
+    return page
+
+
+class TestGetMetadata(unittest.TestCase):
+    def setUp(self):
+        remote = _catalogpage('page1.json', '2.0.0-beta', '3.0.0', ['2.0.0-beta', '2.0.0', '3.0.0'])
+        root = {'@id': 'root.json', '@type': ['catalog:CatalogRoot'], 'items': [
+            _catalogpage('root.json#0', '4.0.0', '4.1.0', ['4.0.0', '4.1.0']),
+            _catalogpage('root.json#1', '4.2.0-rc.9', '5.0.0', ['4.2.0-rc.9', '4.2.0-rc.10', '5.0.0']),
+        ]}
+        self.index = Index.create({'@id': 'index.json', 'items': [
+            _catalogpage('page0.json', '1.0.0', '1.1.0', ['1.0.0', '1.1.0']),
+            _catalogpage('page1.json', '2.0.0-beta', '3.0.0', [], inlined=False),
+            {'@id': 'root.json', 'lower': '4.0.0', 'upper': '5.0.0'},
+        ]})
+        self.client = NugetClient.__new__(NugetClient)
+        self.client.httpclient = FakeHttpClient({'page1.json': remote, 'root.json': root})
+
+    def get_metadata(self, version: str):
+        return self.client.get_metadata('Pkg', version, self.index)
+
+    def test_inlined_page(self):
+        self.assertEqual(self.get_metadata('1.1.0').entry.version.text, '1.1.0')
+        self.assertEqual(self.client.httpclient.requested, [])
+
+    def test_fetched_page(self):
+        self.assertEqual(self.get_metadata('2.0.0').entry.version.text, '2.0.0')
+        self.assertEqual(self.get_metadata('2.0.0-beta').entry.version.text, '2.0.0-beta')
+        self.assertEqual(self.client.httpclient.requested, ['page1.json', 'page1.json'])
+
+    def test_catalog_root_pages(self):
+        self.assertEqual(self.get_metadata('4.1.0').entry.version.text, '4.1.0')
+        self.assertEqual(self.get_metadata('4.2.0-rc.10').entry.version.text, '4.2.0-rc.10')
+
+    def test_missing_version(self):
+        self.assertIsNone(self.get_metadata('1.0.5'))
+        self.assertIsNone(self.get_metadata('1.5.0'))
+        self.assertIsNone(self.get_metadata('4.1.5'))
@@ -1,16 +1,17 @@
-import xml.etree.ElementTree as ET
+import os
+import tempfile
 import unittest
 
-from nuget.xml import Consts, PackageReference
+from lxml import etree as ET
+
+from nuget.xml import Consts, PackageReference, get_package_references
 
 
 # TODO - write real tests...
 
 class TestXmlMethods(unittest.TestCase):
     def test_pref(self):
-        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
-
-        tree = ET.parse('test.xml', parser=parser)
+        tree = ET.parse('test.xml')
 
         root = tree.getroot()
 
@@ -44,7 +45,72 @@ class TestXmlMethods(unittest.TestCase):
         print(pref)
         print(ET.tostring(root, encoding='unicode'), '\n\n')
 
-        del pref
+        pref.detach()
 
         print(ET.tostring(root, encoding='unicode'), '\n\n')
         print(pref)
+
+
+class TestPackageReference(unittest.TestCase):
+    def setUp(self):
+        self.item_group = ET.fromstring('<ItemGroup><PackageReference Include="Serilog" Version="2.10.0"/></ItemGroup>')
+        self.pref = PackageReference.create(self.item_group[0], self.item_group)
+
+    def assertAttributes(self, version, version_override):
+        self.assertEqual(self.pref.version, version)
+        self.assertEqual(self.pref.version_override, version_override)
+        self.assertEqual(self.pref.xml.get(Consts.Attributes.VERSION), version)
+        self.assertEqual(self.pref.xml.get(Consts.Attributes.VERSION_OVERRIDE), version_override)
+
+    def test_version(self):
+        self.pref.version = '3.0'
+        self.assertAttributes('3.0', None)
+        self.pref.version = None
+        self.assertAttributes(None, None)
+        self.pref.version = None
+        self.assertAttributes(None, None)
+
+    def test_version_override(self):
+        self.pref.version_override = '2.0'
+        self.assertAttributes(None, '2.0')
+        # Version is ignored while an override is set
+        self.pref.version = '3.0'
+        self.assertAttributes(None, '2.0')
+        self.pref.version_override = None
+        self.assertAttributes(None, None)
+        self.pref.version = '3.0'
+        self.assertAttributes('3.0', None)
+
+    def test_detach(self):
+        self.pref.detach()
+        self.assertEqual(len(self.item_group), 0)
+        self.pref.detach()
+
+
+class TestGetPackageReferences(unittest.TestCase):
+    CSPROJ = """<Project Sdk="Microsoft.NET.Sdk">
+  <ItemGroup>
+    <!-- logging -->
+    <PackageReference Include="nLog.Extensions" Version="5.0.0" />
+    <PackageReference Update="Serilog" Version="2.10.0" />
+    <PackageReference Include="" Version="1.0.0" />
+  </ItemGroup>
+  <ItemGroup>
+    <Compile Include="Foo.cs" />
+  </ItemGroup>
+</Project>"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.csproj')
+        with os.fdopen(fd, 'w') as file:
+            file.write(self.CSPROJ)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_get_package_references(self):
+        prefs = get_package_references(self.path)
+        self.assertEqual([pref.name for pref in prefs], ['nLog.Extensions', None, ''])
+        self.assertEqual([pref.vendor for pref in prefs], ['NLog', None, None])
+        self.assertEqual([pref.version for pref in prefs], ['5.0.0', '2.10.0', '1.0.0'])
+        self.assertTrue(all(pref.root.tag == Consts.Elements.ITEM_GROUP for pref in prefs))